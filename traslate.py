@@ -1,129 +1,544 @@
+import atexit
+import logging
+import math
+import os
 import queue
+import signal
 import sys
+import threading
 import time
 import random
+import shelve
+import string
+
+# Hilos de CPU para Whisper; OMP_NUM_THREADS debe fijarse antes de importar faster_whisper
+CPU_THREADS = max(1, (os.cpu_count() or 2) // 2)
+os.environ.setdefault("OMP_NUM_THREADS", str(CPU_THREADS))
+
 import numpy as np
+from collections import deque
 import sounddevice as sd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from faster_whisper import WhisperModel
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import TranscriptionOptions, get_suppressed_tokens
+import requests
+from requests.adapters import HTTPAdapter
 from deep_translator import GoogleTranslator
+from deep_translator.validate import is_input_valid
+try:
+    from numba import njit  # Opcional: compila el copiado + energía de cada chunk
+except ImportError:
+    njit = None
 
 # --- Configuración ---
 SAMPLE_RATE = 16000
 BLOCK_SIZE = 4000  # Tamaño del bloque de audio (en samples) a procesar por callback
-THRESHOLD = 0.01   # Umbral de amplitud para detectar silencio (ajustar según micrófono)
+THRESHOLD = 0.01   # Umbral de amplitud para cortar frases por silencio (ajustar según micrófono)
 SILENCE_DURATION = 1.0  # Segundos de silencio para considerar fin de frase
 MODEL_SIZE = "tiny"     # "tiny", "base", "small", "medium", "large"
 DEVICE = "cpu"          # "cuda" si tienes GPU Nvidia, sino "cpu"
-COMPUTE_TYPE = "int8"   # "float16", "int8_float16", "int8"
+# "float16", "int8_float16", "int8"; en GPU int8_float16 aprovecha mejor los tensor cores
+COMPUTE_TYPE = "int8_float16" if DEVICE == "cuda" else "int8"
+BUFFER_SECONDS = 30     # Máximo de audio acumulado antes de reiniciar el buffer
+PCM_SCALE = 32768.0     # El audio se captura en int16; escala para pasarlo a float [-1, 1)
+# Silero VAD de faster-whisper: decide qué partes de la frase llegan a Whisper
+VAD_PARAMETERS = dict(min_silence_duration_ms=500, threshold=0.5)
+BATCH_SIZE = 8     # Máximo de frases transcritas en una sola pasada del encoder
+BATCH_WAIT = 0.1   # Segundos que se espera a una segunda frase antes de transcribir
+PARTIAL_INTERVAL = 0.5  # Segundos entre transcripciones parciales mientras se habla
+TRANSLATE_BATCH = 8   # Máximo de textos traducidos en una sola petición
+TRANSLATE_WAIT = 0.2  # Segundos que se acumulan textos antes de traducirlos
+TRANSLATE_MAX_CHARS = 5000  # Límite de caracteres por petición (el mismo de deep_translator)
+# Caché persistente de traducciones (shelve añade su propia extensión)
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "traslate", "translations")
+
+# --- Logging no bloqueante ---
+# Los mensajes del loop de audio se escriben a consola desde un hilo aparte
+# (QueueListener), así una consola lenta no frena la captura.
+# Los avisos (WARNING o más, p. ej. el estado de PortAudio) van a stderr; el resto a stdout.
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger("traslate")
+logger.setLevel(logging.INFO)
+logger.addHandler(QueueHandler(log_queue))
+stdout_handler = logging.StreamHandler(sys.stdout)
+stdout_handler.addFilter(lambda record: record.levelno < logging.WARNING)
+stderr_handler = logging.StreamHandler(sys.stderr)
+stderr_handler.setLevel(logging.WARNING)
+log_listener = QueueListener(log_queue, stdout_handler, stderr_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+# --- Buffer de audio ---
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def push_chunk(buf, write, chunk):
+        # Copia `chunk` en `buf` desde `write` y suma sus cuadrados en una sola
+        # pasada compilada, sin temporales; devuelve el nuevo `write` y la energía
+        energy = 0.0
+        for i in range(chunk.shape[0]):
+            sample = chunk[i]
+            buf[write + i] = sample
+            energy += float(sample) * float(sample)
+        return write + chunk.shape[0], energy
+
+    # Compilar ahora y no con el primer chunk de audio
+    push_chunk(np.zeros(1, np.int16), 0, np.zeros(1, np.int16))
+else:
+    def push_chunk(buf, write, chunk):
+        """Copia `chunk` en `buf` desde `write`; devuelve el nuevo `write` y su suma de cuadrados."""
+        n = len(chunk)
+        buf[write:write + n] = chunk
+        # Suma de cuadrados con un solo dot BLAS (sdot) en float32
+        x = chunk.astype(np.float32)
+        return write + n, float(x @ x)
+
+# --- Traductor ---
+class SessionGoogleTranslator(GoogleTranslator):
+    """GoogleTranslator que reutiliza la conexión HTTPS (keep-alive) entre frases.
+
+    deep_translator abre una conexión nueva por llamada; aquí se usa una
+    `requests.Session` persistente contra el endpoint JSON de Google.
+    """
+
+    url = "https://translate.googleapis.com/translate_a/single"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+    def translate(self, text, **kwargs):
+        text = text.strip()
+        if not text or self._same_source_target():
+            return text
+        is_input_valid(text, max_chars=TRANSLATE_MAX_CHARS)
+        params = {"client": "gtx", "sl": self._source, "tl": self._target, "dt": "t"}
+        # El texto va en el cuerpo del POST: varias frases juntas no caben en una URL
+        response = self.session.post(self.url, params=params, data={"q": text},
+                                     proxies=self.proxies, timeout=10)
+        response.raise_for_status()
+        # [[["traducción", "original", ...], ...], ...]: una entrada por oración
+        return "".join(part[0] for part in response.json()[0] if part[0])
+
+# --- Caché de traducciones ---
+def open_translation_cache():
+    """Abre la caché persistente de traducciones (o una en memoria si falla)."""
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        cache = shelve.open(CACHE_PATH)
+    except Exception as e:
+        print(f"No se pudo abrir la caché de traducciones ({e}), se usará sólo memoria")
+        return {}
+    atexit.register(cache.close)
+    return cache
+
+def cached_translate(translator, cache):
+    """Envuelve translator.translate con una caché LRU y la caché persistente.
+
+    Devuelve la función de traducción y otra que precarga en memoria varios
+    textos con una sola petición.
+    """
+    prefix = f"{translator.source}:{translator.target}:"
+    # Traducciones de una petición conjunta: sólo en memoria, porque el reparto
+    # por líneas puede salir corrido y no debe quedar guardado entre sesiones
+    prefetched = {}
+
+    @lru_cache(maxsize=4096)
+    def translate(text):
+        key = prefix + text
+        translated = cache.get(key)
+        if translated is None:
+            translated = prefetched.pop(text, None)
+        if translated is None:
+            translated = translator.translate(text)
+            if translated:
+                cache[key] = translated
+        return translated
+
+    def prefetch_group(missing):
+        if len(missing) < 2:
+            return
+        # Una línea por texto; si la respuesta no conserva las líneas, cada
+        # texto se traduce por separado al pedirlo
+        try:
+            joined = translator.translate("\n".join(missing))
+        except Exception:
+            return
+        parts = joined.split("\n") if joined else []
+        if len(parts) == len(missing):
+            for text, translated in zip(missing, parts):
+                if translated.strip():
+                    prefetched[text] = translated.strip()
+
+    def prefetch(texts):
+        missing = [t for t in dict.fromkeys(texts)
+                   if prefix + t not in cache and t not in prefetched]
+        # Partir en peticiones que no pasen TRANSLATE_MAX_CHARS (con los "\n")
+        group, size = [], 0
+        for text in missing:
+            if group and size + len(text) >= TRANSLATE_MAX_CHARS:
+                prefetch_group(group)
+                group, size = [], 0
+            group.append(text)
+            size += len(text) + 1
+        prefetch_group(group)
+
+    return translate, prefetch
+
+# --- Transcripción por lotes ---
+def greedy_options(tokenizer):
+    """Opciones de decodificación greedy sin timestamps: la app sólo usa el texto."""
+    return TranscriptionOptions(
+        beam_size=1, best_of=1, patience=1, length_penalty=1, repetition_penalty=1,
+        no_repeat_ngram_size=0, log_prob_threshold=-1.0, no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4, condition_on_previous_text=False,
+        prompt_reset_on_temperature=0.5, temperatures=[0.0], initial_prompt=None, prefix=None,
+        suppress_blank=True, suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        without_timestamps=True, max_initial_timestamp=0.0, word_timestamps=False,
+        prepend_punctuations="", append_punctuations="", multilingual=False,
+        max_new_tokens=None, clip_timestamps="0", hallucination_silence_threshold=None,
+        hotwords=None)
 
 # --- Inicialización ---
 print("Cargando modelo Whisper...")
-model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE,
+                     cpu_threads=CPU_THREADS, num_workers=1)
+pipeline = BatchedInferencePipeline(model=model)
+vad_options = VadOptions(**VAD_PARAMETERS)
+# transcribe_batch decodifica directamente, con una fila del encoder por frase
+tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language="en")
+batch_options = greedy_options(tokenizer)
 print("Modelo cargado.")
 
-translator = GoogleTranslator(source='en', target='es')
+# Precalentar Whisper y Silero VAD con 1 s de silencio: la primera inferencia
+# paga la carga de pesos y kernels, y así no la sufre la primera frase real
+silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+get_speech_timestamps(silence, vad_options)
+list(pipeline.transcribe(silence, language="en", clip_timestamps=[{"start": 0, "end": 1.0}],
+                         beam_size=1, without_timestamps=True)[0])
+print("Modelo precalentado.")
+
+translator = SessionGoogleTranslator(source='en', target='es')
+translate_cached, prefetch_translations = cached_translate(translator, open_translation_cache())
 
-audio_queue = queue.Queue()
+# Chunks del callback de audio: un solo productor y un solo consumidor, así que
+# basta un deque (append/popleft son atómicos) y un Event para despertar al loop
+audio_chunks = deque()
+audio_ready = threading.Event()
+# Pipeline de 3 etapas (transcribir -> traducir -> guardar) unidas por colas
+# acotadas: si una etapa se atrasa, la anterior espera en vez de acumular.
+# Frases pendientes de transcribir: ("final", audio) o ("parcial", audio)
+phrase_queue = queue.Queue(maxsize=4)
+text_queue = queue.Queue(maxsize=4)    # Textos transcritos pendientes de traducir
+record_queue = queue.Queue(maxsize=4)  # Pares (original, traducción) pendientes de guardar
+# Archivo de traducciones abierto una sola vez, con buffer por línea
+md_file = open("translations.md", "a", encoding="utf-8", buffering=1)
+atexit.register(md_file.close)
 
 def callback(indata, frames, time, status):
     """Callback de audio que se ejecuta en un hilo separado."""
     if status:
-        print(status, file=sys.stderr)
-    # Copiar datos a la cola
-    audio_queue.put(indata.flatten().copy())
+        logger.warning(status)
+    # Copiar datos al deque y despertar al loop principal
+    audio_chunks.append(indata.flatten().copy())
+    audio_ready.set()
+
+def request_stop(signum, frame):
+    """Handler de Ctrl+C: desbloquea el loop principal con un centinela."""
+    # Un segundo Ctrl+C interrumpe directamente
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    audio_chunks.append(None)
+    audio_ready.set()
+
+def to_float32(samples):
+    """Convierte audio int16 a float32 en [-1, 1) con una sola copia."""
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / PCM_SCALE
+    return audio
+
+def collect_phrases(phrase):
+    """Junta la frase con las finales que ya estén en cola (o lleguen en BATCH_WAIT).
+
+    Los parciales encontrados por el camino ya no sirven y se descartan.
+    Devuelve la lista de frases y si se recibió el centinela de fin.
+    """
+    pending = [phrase]
+    try:
+        item = phrase_queue.get(timeout=BATCH_WAIT)
+        while item is not None:
+            kind, audio = item
+            if kind == "final":
+                pending.append(audio)
+                if len(pending) >= BATCH_SIZE:
+                    return pending, False
+            item = phrase_queue.get_nowait()
+        return pending, True
+    except queue.Empty:
+        return pending, False
+
+def transcribe_batch(phrases):
+    """Transcribe varias frases con una sola pasada batcheada del encoder.
+
+    Cada frase se recorta con Silero VAD y ocupa su propia fila (ventana de
+    30 s) del batch, así cada texto vuelve a su frase sin mapear timestamps.
+    """
+    texts = [""] * len(phrases)
+    voiced, features = [], []
+    for i, phrase in enumerate(phrases):
+        speech = get_speech_timestamps(phrase, vad_options)
+        if speech:
+            voiced.append(i)
+            trimmed = phrase[speech[0]["start"]:speech[-1]["end"]]
+            features.append(pad_or_trim(model.feature_extractor(trimmed)[..., :-1]))
+    if not voiced:
+        return texts
+    _, outputs = pipeline.generate_segment_batched(np.stack(features), tokenizer, batch_options)
+    for i, output in zip(voiced, outputs):
+        texts[i] = tokenizer.decode(output["tokens"]).strip()
+    return texts
+
+def transcribe_partial(audio):
+    """Transcripción rápida de la frase en curso, sin VAD ni batching."""
+    segments, info = model.transcribe(
+        audio, language="en", beam_size=1, best_of=1, temperature=0.0,
+        condition_on_previous_text=False, without_timestamps=True, vad_filter=False)
+    return " ".join(segment.text.strip() for segment in segments).split()
+
+def agreed_prefix(previous, current):
+    """LocalAgreement-2: palabras en las que coinciden dos transcripciones seguidas."""
+    n = 0
+    for a, b in zip(previous, current):
+        if a.strip(string.punctuation).lower() != b.strip(string.punctuation).lower():
+            break
+        n += 1
+    return current[:n]
+
+def transcription_worker():
+    """Etapa 1: transcribe las frases finalizadas, fuera del loop de captura.
+
+    Los parciales sólo se muestran: se imprime la parte que coincide entre
+    dos transcripciones parciales seguidas de la misma frase.
+    """
+    previous_words = []  # Última transcripción parcial de la frase en curso
+    shown_words = 0
+    stop = False
+    try:
+        while not stop:
+            item = phrase_queue.get()
+            if item is None:
+                break
+            kind, phrase = item
+
+            if kind == "parcial":
+                # Si ya hay algo más en cola, este parcial está viejo
+                if not phrase_queue.empty():
+                    continue
+                try:
+                    words = transcribe_partial(phrase)
+                except Exception as e:
+                    print(f"Error transcribiendo: {e}")
+                    continue
+                agreed = agreed_prefix(previous_words, words)
+                if len(agreed) > shown_words:
+                    print(f"... {' '.join(agreed)}")
+                    shown_words = len(agreed)
+                previous_words = words
+                continue
+
+            previous_words, shown_words = [], 0
+            phrases, stop = collect_phrases(phrase)
+
+            # Transcribir
+            try:
+                texts = transcribe_batch(phrases)
+            except Exception as e:
+                print(f"Error transcribiendo: {e}")
+                continue
+
+            for text in texts:
+                if text:
+                    text_queue.put(text)
+    finally:
+        text_queue.put(None)
+
+def translation_worker():
+    """Etapa 2: traduce los textos, juntando los que llegan en TRANSLATE_WAIT."""
+    pending_texts = []  # Textos transcritos que esperan a traducirse juntos
+    first_pending = 0.0
+    stop = False
+    try:
+        while not stop:
+            # Con textos pendientes, esperar sólo hasta que toque traducirlos
+            timeout = None
+            if pending_texts:
+                timeout = max(0.0, first_pending + TRANSLATE_WAIT - time.time())
+            try:
+                text = text_queue.get(timeout=timeout)
+            except queue.Empty:
+                pass  # Se cumplió TRANSLATE_WAIT: traducir lo pendiente
+            else:
+                if text is None:
+                    stop = True
+                else:
+                    if not pending_texts:
+                        first_pending = time.time()
+                    pending_texts.append(text)
+                    if len(pending_texts) < TRANSLATE_BATCH:
+                        continue
+
+            # Traducir en una sola petición si es posible, manteniendo el orden
+            prefetch_translations(pending_texts)
+            for full_text in pending_texts:
+                try:
+                    record_queue.put((full_text, translate_cached(full_text)))
+                except Exception as e:
+                    print(f"Error traduciendo: {e}")
+            pending_texts = []
+    finally:
+        record_queue.put(None)
+
+def writer_worker():
+    """Etapa 3: muestra y guarda cada traducción en translations.md."""
+    while True:
+        record = record_queue.get()
+        if record is None:
+            break
+        full_text, translated = record
+        try:
+            print(f"\nEN: {full_text}")
+            print(f"ES: {translated}\n")
+            print("-" * 30)
+
+            # Guardar en archivo
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            md_file.write(f"## {timestamp}\n"
+                          f"**Original:** {full_text}\n\n"
+                          f"**Traducción:** {translated}\n"
+                          "---\n\n")
+        except Exception as e:
+            print(f"Error guardando traducción: {e}")
+
+def run_stage(worker, in_queue):
+    """Ejecuta una etapa del pipeline.
+
+    Si la etapa falla, sigue vaciando su cola de entrada hasta el centinela:
+    así las etapas anteriores y el loop de audio no se bloquean en `put`.
+    """
+    try:
+        worker()
+    except Exception:
+        logger.exception(f"La etapa {worker.__name__} terminó por un error")
+        while in_queue.get() is not None:
+            pass
+        raise
 
 def main():
     print(f"\nIniciando traducción en tiempo real (EN -> ES)...")
     print("Habla en Inglés. Presiona Ctrl+C para salir.\n")
 
-    # Buffer acumulativo de audio
-    audio_buffer = np.array([], dtype=np.float32)
+    # Buffer de audio preasignado; `write` marca cuántos samples son válidos
+    buffer_capacity = SAMPLE_RATE * BUFFER_SECONDS
+    audio_buffer = np.empty(buffer_capacity, dtype=np.int16)
+    write = 0
+    # Energía (suma de cuadrados) por chunk de la ventana reciente, para el RMS incremental
+    window_energy = deque()
+    sum_sq = 0.0
+    sum_n = 0
     last_speak_time = time.time()
+    last_partial_time = 0.0
     is_speaking = False
+    signal.signal(signal.SIGINT, request_stop)
     
-    # Iniciar stream de audio
-    with sd.InputStream(callback=callback, channels=1, samplerate=SAMPLE_RATE, blocksize=BLOCK_SIZE):
-        while True:
-            # Leer todo lo que haya en la queue
-            try:
-                while True:
-                    chunk = audio_queue.get_nowait()
-                    audio_buffer = np.concatenate((audio_buffer, chunk))
-            except queue.Empty:
-                pass
+    # Iniciar las etapas del pipeline y el stream de audio
+    with ThreadPoolExecutor(max_workers=3) as executor, \
+            sd.InputStream(callback=callback, channels=1, samplerate=SAMPLE_RATE, blocksize=BLOCK_SIZE,
+                           dtype="int16"):
+        stages = [executor.submit(run_stage, worker, in_queue)
+                  for worker, in_queue in ((transcription_worker, phrase_queue),
+                                           (translation_worker, text_queue),
+                                           (writer_worker, record_queue))]
+        try:
+            while True:
+                # Esperar el siguiente chunk y leer todo lo que haya en el deque.
+                # El timeout permite detectar el silencio aunque no llegue audio.
+                audio_ready.wait(timeout=0.2)
+                audio_ready.clear()
+                # Si una etapa del pipeline murió, dejar de capturar y propagar su error
+                for stage in stages:
+                    if stage.done():
+                        stage.result()
+                while audio_chunks:
+                    chunk = audio_chunks.popleft()
+                    if chunk is None:
+                        raise KeyboardInterrupt
+                    n = len(chunk)
+                    # Limpiar buffer si se llena sin silencios (e.g. ruido constante)
+                    if write + n > buffer_capacity:
+                        logger.info("Buffer lleno (ruido constante?), reiniciando...")
+                        write = 0
+                        window_energy.clear()
+                        sum_sq, sum_n = 0.0, 0
+                        is_speaking = False
+                    write, energy = push_chunk(audio_buffer, write, chunk)
+                    window_energy.append((n, energy))
+                    sum_sq += energy
+                    sum_n += n
+                    # Descartar chunks viejos mientras la ventana siga cubierta sin ellos
+                    while sum_n - window_energy[0][0] >= BLOCK_SIZE * 4:
+                        old_n, old_energy = window_energy.popleft()
+                        sum_sq -= old_energy
+                        sum_n -= old_n
 
-            # Si el buffer está vacío, esperar un poco
-            if len(audio_buffer) == 0:
-                sd.sleep(50)
-                continue
+                # Si el buffer está vacío, seguir esperando
+                if write == 0:
+                    continue
 
-            # Detectar volumen (RMS) del último bloque añadido (aprox)
-            # Para simplificar, miramos el buffer entero reciente si es pequeño
-            # O mejor, mirar los últimos N samples
-            check_size = min(len(audio_buffer), BLOCK_SIZE * 4) 
-            recent_audio = audio_buffer[-check_size:]
-            rms = np.sqrt(np.mean(recent_audio**2))
+                # Detectar volumen (RMS) de los últimos ~BLOCK_SIZE * 4 samples,
+                # a partir de la suma de cuadrados acumulada por chunk
+                rms = math.sqrt(max(sum_sq, 0.0) / sum_n) / PCM_SCALE if sum_n else 0.0
 
-            current_time = time.time()
+                current_time = time.time()
 
-            if rms > THRESHOLD:
-                if not is_speaking:
-                    is_speaking = True
-                    print(f"Voz detectada (RMS: {rms:.4f})")
-                last_speak_time = current_time
-            else:
-                 # Debug: Imprimir RMS ocasionalmente si no se habla
-                 if random.random() < 0.05:
-                     print(f"Silencio... (RMS: {rms:.4f})")
+                if rms > THRESHOLD:
+                    if not is_speaking:
+                        is_speaking = True
+                        logger.info(f"Voz detectada (RMS: {rms:.4f})")
+                    last_speak_time = current_time
+                else:
+                     # Debug: Imprimir RMS ocasionalmente si no se habla
+                     if random.random() < 0.05:
+                         logger.info(f"Silencio... (RMS: {rms:.4f})")
             
-            # Si ha pasado X tiempo desde el último sonido fuerte, y tenemos algo de audio
-            silence_time = current_time - last_speak_time
+                # Si ha pasado X tiempo desde el último sonido fuerte, y tenemos algo de audio
+                silence_time = current_time - last_speak_time
             
-            # Procesar si hay silencio suficiente Y tenemos suficiente audio acumulado (> 0.5s)
-            if silence_time > SILENCE_DURATION and len(audio_buffer) > SAMPLE_RATE * 0.5:
-                # Procesar frase
-                # print("Procesando frase...")
-                
-                # Transcribir
-                segments, info = model.transcribe(audio_buffer, beam_size=5, language="en")
-                
-                full_text = ""
-                for segment in segments:
-                    full_text += segment.text + " "
-                
-                full_text = full_text.strip()
-                
-                if full_text:
-                    try:
-                        translated = translator.translate(full_text)
-                        print(f"\nEN: {full_text}")
-                        print(f"ES: {translated}\n")
-                        print("-" * 30)
-
-                        # Guardar en archivo
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        with open("translations.md", "a", encoding="utf-8") as f:
-                            f.write(f"## {timestamp}\n")
-                            f.write(f"**Original:** {full_text}\n\n")
-                            f.write(f"**Traducción:** {translated}\n")
-                            f.write("---\n\n")
-
-                    except Exception as e:
-                        print(f"Error traduciendo: {e}")
-                
-                # Resetear buffer y estado
-                audio_buffer = np.array([], dtype=np.float32)
-                is_speaking = False
-
-            # Limpiar buffer si se hace demasiado grande sin silencios (e.g. ruido constante)
-            # para evitar crash de memoria. Max 30 segundos.
-            if len(audio_buffer) > SAMPLE_RATE * 30:
-                print("Buffer lleno (ruido constante?), reiniciando...")
-                audio_buffer = np.array([], dtype=np.float32)
-                is_speaking = False
-
-            sd.sleep(50)
+                # Procesar si hay silencio suficiente Y tenemos suficiente audio acumulado (> 0.5s)
+                if silence_time > SILENCE_DURATION and write > SAMPLE_RATE * 0.5:
+                    # Enviar la frase al worker en float32, que es lo que espera Whisper
+                    phrase_queue.put(("final", to_float32(audio_buffer[:write])))
+
+                    # Resetear buffer y estado
+                    write = 0
+                    window_energy.clear()
+                    sum_sq, sum_n = 0.0, 0
+                    is_speaking = False
+
+                # Mientras se habla, pedir cada PARTIAL_INTERVAL una transcripción
+                # parcial de la frase en curso (sólo si el worker está libre)
+                elif (is_speaking and write > SAMPLE_RATE * 0.5
+                      and current_time - last_partial_time >= PARTIAL_INTERVAL
+                      and phrase_queue.empty()):
+                    phrase_queue.put(("parcial", to_float32(audio_buffer[:write])))
+                    last_partial_time = current_time
+        finally:
+            # Terminar el pipeline cuando haya procesado las frases pendientes
+            phrase_queue.put(None)
 
 if __name__ == "__main__":
     try:
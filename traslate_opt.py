@@ -1,17 +1,42 @@
+import atexit
+import math
 import queue
+import signal
 import sys
+import threading
 import time
+import os
 import random
+import shelve
+import string
+
+# Hilos de CPU para Whisper; OMP_NUM_THREADS debe fijarse antes de importar faster_whisper
+CPU_THREADS = max(1, (os.cpu_count() or 2) // 2)
+os.environ.setdefault("OMP_NUM_THREADS", str(CPU_THREADS))
+
 import numpy as np
 import sounddevice as sd
 from datetime import datetime
-from faster_whisper import WhisperModel
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from functools import lru_cache, partial
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import TranscriptionOptions, get_suppressed_tokens
+import requests
+from requests.adapters import HTTPAdapter
 from deep_translator import GoogleTranslator
+from deep_translator.validate import is_input_valid
+try:
+    from numba import njit  # Opcional: compila el copiado + energía de cada chunk
+except ImportError:
+    njit = None
 import argparse
 import configparser
-from collections import deque
-import os
 import logging
+from logging.handlers import QueueHandler, QueueListener
 
 # --- Configuración por defecto ---
 DEFAULTS = {
@@ -21,12 +46,27 @@ DEFAULTS = {
     'SILENCE_DURATION': 1.0,
     'MODEL_SIZE': 'tiny',
     'DEVICE': 'cpu',
-    'COMPUTE_TYPE': 'int8',
+    'COMPUTE_TYPE': 'auto',
     'SOURCE_LANG': 'en',
     'TARGET_LANG': 'es',
     'BUFFER_SECONDS': 30
 }
 
+PCM_SCALE = 32768.0  # El audio se captura en int16; escala para pasarlo a float [-1, 1)
+
+# Silero VAD de faster-whisper: decide qué partes de la frase llegan a Whisper.
+# El umbral RMS (THRESHOLD) sólo decide cuándo se corta la frase.
+VAD_PARAMETERS = dict(min_silence_duration_ms=500, threshold=0.5)
+BATCH_SIZE = 8     # Máximo de frases transcritas en una sola pasada del encoder
+BATCH_WAIT = 0.1   # Segundos que se espera a una segunda frase antes de transcribir
+PARTIAL_INTERVAL = 0.5  # Segundos entre transcripciones parciales mientras se habla
+LANGUAGE_MIN_PROB = 0.5  # Confianza mínima para fijar el idioma detectado (SOURCE_LANG = auto)
+TRANSLATE_BATCH = 8   # Máximo de textos traducidos en una sola petición
+TRANSLATE_WAIT = 0.2  # Segundos que se acumulan textos antes de traducirlos
+TRANSLATE_MAX_CHARS = 5000  # Límite de caracteres por petición (el mismo de deep_translator)
+# Caché persistente de traducciones (shelve añade su propia extensión)
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "traslate", "translations")
+
 # --- Cargar configuración desde archivo opcional ---
 def load_config_file(config_path="config.ini"):
     config = configparser.ConfigParser()
@@ -47,8 +87,8 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Real-Time Speech Translator (Whisper + GoogleTranslator)")
     parser.add_argument('--model_size', default=None, help="Modelo Whisper (tiny, base, small, medium, large)")
     parser.add_argument('--device', default=None, help="Dispositivo (cpu o cuda)")
-    parser.add_argument('--compute_type', default=None, help="Tipo de cómputo para Whisper (float16, int8_float16, int8)")
-    parser.add_argument('--source_lang', default=None, help="Idioma original (ej: en)")
+    parser.add_argument('--compute_type', default=None, help="Tipo de cómputo para Whisper (auto, float16, int8_float16, int8)")
+    parser.add_argument('--source_lang', default=None, help="Idioma original (ej: en, o auto para detectarlo)")
     parser.add_argument('--target_lang', default=None, help="Idioma de destino (ej: es)")
     parser.add_argument('--threshold', type=float, default=None, help="Umbral de detección de silencio [0.0-1.0]")
     parser.add_argument('--sample_rate', type=int, default=None, help="Sample rate de entrada de audio")
@@ -58,17 +98,173 @@ def parse_args():
     return parser.parse_args()
 
 # --- Logger Avanzado ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', 
-                    handlers=[logging.StreamHandler(), logging.FileHandler("traslate.log", encoding='utf-8')])
+# Los handlers reales (consola y archivo) corren en un hilo aparte (QueueListener);
+# el loop de audio sólo encola el registro y no se bloquea con una consola lenta.
+# La barra de volumen va por el logger 'Traslate.vol': sin salto de línea y fuera del archivo.
+def _not_vol(record):
+    return record.name != 'Traslate.vol'
+
+log_formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+console_handler = logging.StreamHandler()
+file_handler = logging.FileHandler("traslate.log", encoding='utf-8')
+for handler in (console_handler, file_handler):
+    handler.setFormatter(log_formatter)
+    handler.addFilter(_not_vol)
+vol_handler = logging.StreamHandler(sys.stdout)
+vol_handler.terminator = ""
+vol_handler.addFilter(logging.Filter('Traslate.vol'))
+
+log_queue = queue.SimpleQueue()
+# El QueueHandler sólo deja el mensaje: el formato lo ponen los handlers del listener
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+# faster-whisper registra "Processing audio..." en cada transcripción (varias por
+# segundo con los parciales): sólo interesan sus avisos
+logging.getLogger("faster_whisper").setLevel(logging.WARNING)
+log_listener = QueueListener(log_queue, console_handler, file_handler, vol_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
 logger = logging.getLogger('Traslate')
+vol_logger = logging.getLogger('Traslate.vol')
+
+# --- Traductor ---
+class SessionGoogleTranslator(GoogleTranslator):
+    """GoogleTranslator que reutiliza la conexión HTTPS (keep-alive) entre frases.
+
+    deep_translator abre una conexión nueva por llamada; aquí se usa una
+    `requests.Session` persistente contra el endpoint JSON de Google.
+    """
+
+    url = "https://translate.googleapis.com/translate_a/single"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
+    def translate(self, text, **kwargs):
+        text = text.strip()
+        if not text or self._same_source_target():
+            return text
+        is_input_valid(text, max_chars=TRANSLATE_MAX_CHARS)
+        params = {"client": "gtx", "sl": self._source, "tl": self._target, "dt": "t"}
+        # El texto va en el cuerpo del POST: varias frases juntas no caben en una URL
+        response = self.session.post(self.url, params=params, data={"q": text},
+                                     proxies=self.proxies, timeout=10)
+        response.raise_for_status()
+        # [[["traducción", "original", ...], ...], ...]: una entrada por oración
+        return "".join(part[0] for part in response.json()[0] if part[0])
+
+# --- Caché de traducciones ---
+def open_translation_cache(cache_path=CACHE_PATH):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        cache = shelve.open(cache_path)
+    except Exception as e:
+        logger.warning(f"No se pudo abrir la caché de traducciones ({e}), se usará sólo memoria")
+        return {}
+    atexit.register(cache.close)
+    return cache
+
+def cached_translate(translator, cache):
+    # Frases repetidas ("yes", "thanks"...) no vuelven a pasar por la red:
+    # primero una LRU en memoria, luego la caché persistente entre sesiones.
+    # `prefetch` precarga en memoria varios textos con una sola petición.
+    prefix = f"{translator.source}:{translator.target}:"
+    # Traducciones de una petición conjunta: sólo en memoria, porque el reparto
+    # por líneas puede salir corrido y no debe quedar guardado entre sesiones
+    prefetched = {}
+
+    @lru_cache(maxsize=4096)
+    def translate(text):
+        key = prefix + text
+        translated = cache.get(key)
+        if translated is None:
+            translated = prefetched.pop(text, None)
+        if translated is None:
+            translated = translator.translate(text)
+            if translated:
+                cache[key] = translated
+        return translated
+
+    def prefetch_group(missing):
+        if len(missing) < 2:
+            return
+        # Una línea por texto; si la respuesta no conserva las líneas, cada
+        # texto se traduce por separado al pedirlo
+        try:
+            joined = translator.translate("\n".join(missing))
+        except Exception as e:
+            logger.debug(f"Traducción en lote fallida: {e}")
+            return
+        parts = joined.split("\n") if joined else []
+        if len(parts) == len(missing):
+            for text, translated in zip(missing, parts):
+                if translated.strip():
+                    prefetched[text] = translated.strip()
+
+    def prefetch(texts):
+        missing = [t for t in dict.fromkeys(texts)
+                   if prefix + t not in cache and t not in prefetched]
+        # Partir en peticiones que no pasen TRANSLATE_MAX_CHARS (con los "\n")
+        group, size = [], 0
+        for text in missing:
+            if group and size + len(text) >= TRANSLATE_MAX_CHARS:
+                prefetch_group(group)
+                group, size = [], 0
+            group.append(text)
+            size += len(text) + 1
+        prefetch_group(group)
+
+    return translate, prefetch
+
+# --- Buffer de audio ---
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def push_chunk(buf, write, chunk):
+        # Copia `chunk` en `buf` desde `write` y suma sus cuadrados en una sola
+        # pasada compilada, sin temporales; devuelve el nuevo `write` y la energía
+        energy = 0.0
+        for i in range(chunk.shape[0]):
+            sample = chunk[i]
+            buf[write + i] = sample
+            energy += float(sample) * float(sample)
+        return write + chunk.shape[0], energy
+
+    # Compilar ahora y no con el primer chunk de audio
+    push_chunk(np.zeros(1, np.int16), 0, np.zeros(1, np.int16))
+else:
+    def push_chunk(buf, write, chunk):
+        # Copia `chunk` en `buf` desde `write`; devuelve el nuevo `write` y su suma de cuadrados
+        n = len(chunk)
+        buf[write:write + n] = chunk
+        # Suma de cuadrados con un solo dot BLAS (sdot) en float32
+        x = chunk.astype(np.float32)
+        return write + n, float(x @ x)
+
+def to_float32(samples):
+    # Convierte audio int16 a float32 en [-1, 1) con una sola copia
+    audio = samples.astype(np.float32)
+    audio *= 1.0 / PCM_SCALE
+    return audio
+
+# --- Transcripción parcial (streaming) ---
+def agreed_prefix(previous, current):
+    # LocalAgreement-2: palabras en las que coinciden dos transcripciones seguidas
+    n = 0
+    for a, b in zip(previous, current):
+        if a.strip(string.punctuation).lower() != b.strip(string.punctuation).lower():
+            break
+        n += 1
+    return current[:n]
 
 # --- Volumen en consola ---
 def print_vol_bar(rms, threshold):
     bar_length = 40
     filled = int(min(rms/threshold, 1.0) * bar_length)
     bar = ('#' * filled).ljust(bar_length)
-    sys.stdout.write(f"\rVolumen: [{bar}] {rms:.4f}   ")
-    sys.stdout.flush()
+    vol_logger.info(f"\rVolumen: [{bar}] {rms:.4f}   ")
 
 # --- Selección de dispositivo ---
 def choose_input_device():
@@ -86,6 +282,245 @@ def choose_input_device():
         pass
     return None  # usa por defecto
 
+# --- Transcripción por lotes ---
+def greedy_options(tokenizer):
+    # Opciones de decodificación greedy sin timestamps: la app sólo usa el texto
+    return TranscriptionOptions(
+        beam_size=1, best_of=1, patience=1, length_penalty=1, repetition_penalty=1,
+        no_repeat_ngram_size=0, log_prob_threshold=-1.0, no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4, condition_on_previous_text=False,
+        prompt_reset_on_temperature=0.5, temperatures=[0.0], initial_prompt=None, prefix=None,
+        suppress_blank=True, suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        without_timestamps=True, max_initial_timestamp=0.0, word_timestamps=False,
+        prepend_punctuations="", append_punctuations="", multilingual=False,
+        max_new_tokens=None, clip_timestamps="0", hallucination_silence_threshold=None,
+        hotwords=None)
+
+# --- Estado de la sesión ---
+class SessionState:
+    """Modelo, colas y archivo compartidos por el loop de audio y las etapas del pipeline."""
+
+    def __init__(self, params, model, pipeline, vad_options, translate, prefetch, md_file):
+        self.params = params
+        self.model = model
+        self.pipeline = pipeline
+        self.vad_options = vad_options
+        # transcribe_batch decodifica directamente, con una fila del encoder por frase;
+        # un tokenizer por idioma (fija el token de idioma del prompt)
+        self.tokenizers = {}
+        self.batch_options = greedy_options(batch_tokenizer(self, "en"))
+        self.translate = translate
+        self.prefetch = prefetch
+        self.md_file = md_file
+        # Con SOURCE_LANG = auto el idioma se detecta hasta la primera frase final con texto
+        # y se reutiliza en el resto de la sesión, para no pagar la detección en cada transcripción
+        self.source_lang = None if params['SOURCE_LANG'] == 'auto' else params['SOURCE_LANG']
+        # Chunks del callback de audio: un solo productor y un solo consumidor, así que
+        # basta un deque (append/popleft son atómicos) y un Event para despertar al loop
+        self.audio_chunks = deque()
+        self.audio_ready = threading.Event()
+        # Pipeline de 3 etapas (transcribir -> traducir -> guardar) unidas por colas
+        # acotadas: si una etapa se atrasa, la anterior espera en vez de acumular.
+        # Frases pendientes de transcribir: ("final", audio) o ("parcial", audio)
+        self.phrase_queue = queue.Queue(maxsize=4)
+        self.text_queue = queue.Queue(maxsize=4)    # Textos transcritos pendientes de traducir
+        self.record_queue = queue.Queue(maxsize=4)  # Pares (original, traducción) pendientes de guardar
+
+# --- Captura de audio ---
+def audio_callback(state, indata, frames, _time, status):
+    if status:
+        logger.warning(f"Estado en callback: {status}")
+    state.audio_chunks.append(indata.flatten().copy())
+    state.audio_ready.set()
+
+def request_stop(state, signum, frame):
+    # Desbloquea el loop principal; un segundo Ctrl+C interrumpe directamente
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    state.audio_chunks.append(None)
+    state.audio_ready.set()
+
+# --- Transcripción ---
+def collect_phrases(state, phrase):
+    # Junta la frase con las finales que ya estén en cola (o lleguen en BATCH_WAIT);
+    # los parciales encontrados por el camino ya no sirven y se descartan.
+    # Devuelve las frases y si se recibió el centinela de fin.
+    pending = [phrase]
+    try:
+        item = state.phrase_queue.get(timeout=BATCH_WAIT)
+        while item is not None:
+            kind, audio = item
+            if kind == "final":
+                pending.append(audio)
+                if len(pending) >= BATCH_SIZE:
+                    return pending, False
+            item = state.phrase_queue.get_nowait()
+        return pending, True
+    except queue.Empty:
+        return pending, False
+
+def remember_language(state, language, probability):
+    # Fija el idioma de la sesión si la detección es lo bastante segura
+    if state.source_lang is None and probability >= LANGUAGE_MIN_PROB:
+        state.source_lang = language
+        logger.info(f"Idioma detectado: {language} ({probability:.2f})")
+
+def batch_tokenizer(state, language):
+    tokenizer = state.tokenizers.get(language)
+    if tokenizer is None:
+        tokenizer = Tokenizer(state.model.hf_tokenizer, state.model.model.is_multilingual,
+                              task="transcribe", language=language)
+        state.tokenizers[language] = tokenizer
+    return tokenizer
+
+def transcribe_batch(state, phrases):
+    # Una sola pasada batcheada del encoder: cada frase, recortada con Silero VAD,
+    # ocupa su propia fila (ventana de 30 s), así cada texto vuelve a su frase
+    texts = [""] * len(phrases)
+    voiced, features = [], []
+    for i, phrase in enumerate(phrases):
+        speech = get_speech_timestamps(phrase, state.vad_options,
+                                       sampling_rate=state.params['SAMPLE_RATE'])
+        if speech:
+            voiced.append(i)
+            trimmed = phrase[speech[0]["start"]:speech[-1]["end"]]
+            features.append(pad_or_trim(state.model.feature_extractor(trimmed)[..., :-1]))
+    if not voiced:
+        return texts
+
+    language = state.source_lang
+    if language is None:
+        # Sin idioma fijo: detectarlo con la primera frase del lote
+        language, probability, _ = state.model.detect_language(features=features[0])
+    tokenizer = batch_tokenizer(state, language)
+    _, outputs = state.pipeline.generate_segment_batched(np.stack(features), tokenizer,
+                                                         state.batch_options)
+    for i, output in zip(voiced, outputs):
+        texts[i] = tokenizer.decode(output["tokens"]).strip()
+    # Sólo una frase final que produjo texto fija el idioma (no ruido ni parciales)
+    if state.source_lang is None and any(texts):
+        remember_language(state, language, probability)
+    return texts
+
+def transcribe_partial(state, audio):
+    # Transcripción rápida de la frase en curso, sin VAD ni batching. Mientras no
+    # haya idioma fijo, cada parcial lo detecta pero no lo guarda: son muy cortos
+    segments, info = state.model.transcribe(
+        audio, language=state.source_lang, beam_size=1, best_of=1, temperature=0.0,
+        condition_on_previous_text=False, without_timestamps=True, vad_filter=False)
+    return " ".join(s.text.strip() for s in segments).split()
+
+# --- Etapas del pipeline ---
+def transcription_worker(state):
+    # Etapa 1: transcribe las frases finalizadas, fuera del loop de captura.
+    # Los parciales sólo se muestran: la parte en la que coinciden dos
+    # transcripciones parciales seguidas de la misma frase.
+    previous_words = []  # Última transcripción parcial de la frase en curso
+    shown_words = 0
+    stop = False
+    try:
+        while not stop:
+            item = state.phrase_queue.get()
+            if item is None:
+                break
+            kind, phrase = item
+
+            if kind == "parcial":
+                # Si ya hay algo más en cola, este parcial está viejo
+                if not state.phrase_queue.empty():
+                    continue
+                try:
+                    words = transcribe_partial(state, phrase)
+                except Exception as ee:
+                    logger.error(f"Error en transcripción parcial: {ee}")
+                    continue
+                agreed = agreed_prefix(previous_words, words)
+                if len(agreed) > shown_words:
+                    print(f"\n... {' '.join(agreed)}")
+                    shown_words = len(agreed)
+                previous_words = words
+                continue
+
+            previous_words, shown_words = [], 0
+            phrases, stop = collect_phrases(state, phrase)
+            try:
+                texts = transcribe_batch(state, phrases)
+            except Exception as ee:
+                logger.error(f"Error en transcripción: {ee}")
+                continue
+            for full_text in texts:
+                if not full_text:
+                    logger.info("No se detectó texto para traducir.")
+                    continue
+                state.text_queue.put(full_text)
+    finally:
+        state.text_queue.put(None)
+
+def translation_worker(state):
+    # Etapa 2: traduce los textos, juntando los que llegan en TRANSLATE_WAIT
+    pending_texts = []  # Textos transcritos que esperan a traducirse juntos
+    first_pending = 0.0
+    stop = False
+    try:
+        while not stop:
+            # Con textos pendientes, esperar sólo hasta que toque traducirlos
+            timeout = None
+            if pending_texts:
+                timeout = max(0.0, first_pending + TRANSLATE_WAIT - time.time())
+            try:
+                text = state.text_queue.get(timeout=timeout)
+            except queue.Empty:
+                pass  # Se cumplió TRANSLATE_WAIT: traducir lo pendiente
+            else:
+                if text is None:
+                    stop = True
+                else:
+                    if not pending_texts:
+                        first_pending = time.time()
+                    pending_texts.append(text)
+                    if len(pending_texts) < TRANSLATE_BATCH:
+                        continue
+
+            # Traducir en una sola petición si es posible, manteniendo el orden
+            state.prefetch(pending_texts)
+            for full_text in pending_texts:
+                try:
+                    state.record_queue.put((full_text, state.translate(full_text)))
+                except Exception as e:
+                    logger.error(f"Error en traducción: {e}")
+            pending_texts = []
+    finally:
+        state.record_queue.put(None)
+
+def writer_worker(state):
+    # Etapa 3: muestra y guarda cada traducción en translations.md
+    params = state.params
+    while True:
+        record = state.record_queue.get()
+        if record is None:
+            break
+        full_text, translated = record
+        try:
+            print(f"\nEN: {full_text}\n{params['TARGET_LANG'].upper()}: {translated}\n{'-'*30}")
+            timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+            state.md_file.write(f"## {timestamp}\n"
+                                f"**Original ({state.source_lang or params['SOURCE_LANG']}):** {full_text}\n\n"
+                                f"**Traducción ({params['TARGET_LANG']}):** {translated}\n"
+                                "---\n\n")
+            logger.info(f"Texto traducido y guardado [{timestamp}]")
+        except Exception as e:
+            logger.error(f"Error guardando traducción: {e}")
+
+def run_stage(state, worker, in_queue):
+    # Si una etapa falla, sigue vaciando su cola de entrada hasta el centinela:
+    # así las etapas anteriores y el loop de audio no se bloquean en `put`
+    try:
+        worker(state)
+    except Exception:
+        logger.exception(f"La etapa {worker.__name__} terminó por un error")
+        while in_queue.get() is not None:
+            pass
+        raise
+
 # --- Main ---
 def main():
     # --- Cargar configuración ---
@@ -98,57 +533,104 @@ def main():
         if user_arg is not None:
             params[k] = user_arg
 
+    # "auto": int8_float16 en GPU (tensor cores), int8 en CPU
+    if params['COMPUTE_TYPE'] == 'auto':
+        params['COMPUTE_TYPE'] = 'int8_float16' if params['DEVICE'] == 'cuda' else 'int8'
+
     # Mostrar parámetros en uso
     logger.info(f"== Parámetros de traducción ==\n{params}")
     print(f"Guardando logs en traslate.log. Traducciones en translations.md")
 
     logger.info("Cargando modelo Whisper...")
-    model = WhisperModel(params['MODEL_SIZE'], device=params['DEVICE'], compute_type=params['COMPUTE_TYPE'])
+    model = WhisperModel(params['MODEL_SIZE'], device=params['DEVICE'], compute_type=params['COMPUTE_TYPE'],
+                         cpu_threads=CPU_THREADS, num_workers=1)
+    pipeline = BatchedInferencePipeline(model=model)
+    vad_options = VadOptions(**VAD_PARAMETERS)
     logger.info("Modelo cargado.")
 
-    translator = GoogleTranslator(source=params['SOURCE_LANG'], target=params['TARGET_LANG'])
-    audio_queue = queue.Queue()
+    translator = SessionGoogleTranslator(source=params['SOURCE_LANG'], target=params['TARGET_LANG'])
+    translate_cached, prefetch_translations = cached_translate(translator, open_translation_cache())
+    # Archivo de traducciones abierto una sola vez, con buffer por línea
+    md_file = open("translations.md", "a", encoding="utf-8", buffering=1)
+    atexit.register(md_file.close)
+    state = SessionState(params, model, pipeline, vad_options,
+                         translate_cached, prefetch_translations, md_file)
+
+    # Precalentar Whisper y Silero VAD con 1 s de silencio: la primera inferencia
+    # paga la carga de pesos y kernels, y así no la sufre la primera frase real
+    silence = np.zeros(params['SAMPLE_RATE'], dtype=np.float32)
+    get_speech_timestamps(silence, vad_options, sampling_rate=params['SAMPLE_RATE'])
+    list(pipeline.transcribe(silence, language=state.source_lang,
+                             clip_timestamps=[{"start": 0, "end": 1.0}],
+                             beam_size=1, without_timestamps=True)[0])
+    logger.info("Modelo precalentado.")
+
     buffer_samples = int(params['SAMPLE_RATE'] * params.get('BUFFER_SECONDS', 30))
-    # deque para buffer eficiente, maxlen=buffer_samples
-    audio_buffer = deque(maxlen=buffer_samples)
+    # Buffer preasignado; `write` marca cuántos samples son válidos
+    audio_buffer = np.empty(buffer_samples, dtype=np.int16)
+    write = 0
+    # Energía (suma de cuadrados) por chunk de la ventana reciente, para el RMS incremental
+    window_energy = deque()
+    sum_sq = 0.0
+    sum_n = 0
     last_speak_time = time.time()
+    last_partial_time = 0.0
     is_speaking = False
 
     # Selección de input device
     device = choose_input_device()
 
-    def callback(indata, frames, _time, status):
-        if status:
-            logger.warning(f"Estado en callback: {status}")
-        audio_queue.put(indata.flatten().copy())
+    signal.signal(signal.SIGINT, partial(request_stop, state))
 
     print(f"\nIniciando traducción en tiempo real ({params['SOURCE_LANG'].upper()} -> {params['TARGET_LANG'].upper()})...")
     print("Habla. Presiona Ctrl+C para salir.\n")
 
     # --- Audio Stream ---
-    with sd.InputStream(callback=callback, channels=1, samplerate=params['SAMPLE_RATE'], blocksize=params['BLOCK_SIZE'], device=device):
+    with ThreadPoolExecutor(max_workers=3) as executor, \
+            sd.InputStream(callback=partial(audio_callback, state), channels=1, samplerate=params['SAMPLE_RATE'], blocksize=params['BLOCK_SIZE'], device=device,
+                           dtype='int16'):
+        stages = [executor.submit(run_stage, state, worker, in_queue)
+                  for worker, in_queue in ((transcription_worker, state.phrase_queue),
+                                           (translation_worker, state.text_queue),
+                                           (writer_worker, state.record_queue))]
         try:
             while True:
-                # Vaciar toda la queue
-                try:
-                    while True:
-                        chunk = audio_queue.get_nowait()
-                        audio_buffer.extend(chunk)
-                except queue.Empty:
-                    pass
-
-                # Nada de audio, esperar
-                if len(audio_buffer) == 0:
-                    sd.sleep(50)
-                    continue
+                # Esperar el siguiente chunk y vaciar todo el deque
+                # (el timeout permite detectar el silencio sin audio nuevo)
+                state.audio_ready.wait(timeout=0.2)
+                state.audio_ready.clear()
+                # Si una etapa del pipeline murió, dejar de capturar y propagar su error
+                for stage in stages:
+                    if stage.done():
+                        stage.result()
+                while state.audio_chunks:
+                    chunk = state.audio_chunks.popleft()
+                    if chunk is None:
+                        raise KeyboardInterrupt
+                    n = len(chunk)
+                    # Limpiar buffer si se llena (ruido)
+                    if write + n > buffer_samples:
+                        logger.warning("Buffer lleno (ruido constante?), reiniciando buffer...")
+                        write = 0
+                        window_energy.clear()
+                        sum_sq, sum_n = 0.0, 0
+                        is_speaking = False
+                    write, energy = push_chunk(audio_buffer, write, chunk)
+                    window_energy.append((n, energy))
+                    sum_sq += energy
+                    sum_n += n
+                    # Descartar chunks viejos mientras la ventana siga cubierta sin ellos
+                    while sum_n - window_energy[0][0] >= params['BLOCK_SIZE'] * 4:
+                        old_n, old_energy = window_energy.popleft()
+                        sum_sq -= old_energy
+                        sum_n -= old_n
 
-                # Volumen reciente
-                check_size = min(len(audio_buffer), params['BLOCK_SIZE'] * 4)
-                recent_audio = np.array([audio_buffer[-i-1] for i in range(check_size)][::-1], dtype=np.float32)
-                if len(recent_audio) == 0:
+                # Nada de audio, seguir esperando
+                if write == 0:
                     continue
 
-                rms = np.sqrt(np.mean(recent_audio ** 2))
+                # Volumen reciente (suma de cuadrados acumulada por chunk)
+                rms = math.sqrt(max(sum_sq, 0.0) / sum_n) / PCM_SCALE if sum_n else 0.0
                 print_vol_bar(rms, params['THRESHOLD'])
 
                 current_time = time.time()
@@ -164,47 +646,32 @@ def main():
                 # Silencio suficiente + audio acumulado
                 silence_time = current_time - last_speak_time
                 min_len = int(params['SAMPLE_RATE'] * 0.5)
-                if silence_time > params['SILENCE_DURATION'] and len(audio_buffer) > min_len:
-                    # Procesar frase completa
-                    phrase = np.array(audio_buffer, dtype=np.float32)
-                    try:
-                        segments, info = model.transcribe(phrase, beam_size=5, language=params['SOURCE_LANG'])
-                        full_text = " ".join([s.text for s in segments]).strip()
-                        if full_text:
-                            try:
-                                translated = translator.translate(full_text)
-                                print(f"\nEN: {full_text}\n{params['TARGET_LANG'].upper()}: {translated}\n{'-'*30}")
-                                timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-                                with open("translations.md", "a", encoding="utf-8") as f:
-                                    f.write(f"## {timestamp}\n")
-                                    f.write(f"**Original ({params['SOURCE_LANG']}):** {full_text}\n\n")
-                                    f.write(f"**Traducción ({params['TARGET_LANG']}):** {translated}\n")
-                                    f.write("---\n\n")
-                                logger.info(f"Texto traducido y guardado [{timestamp}]")
-                            except Exception as e:
-                                logger.error(f"Error en traducción: {e}")
-                        else:
-                            logger.info("No se detectó texto para traducir.")
-                    except Exception as ee:
-                        logger.error(f"Error en transcripción: {ee}")
+                if silence_time > params['SILENCE_DURATION'] and write > min_len:
+                    # Enviar la frase al worker en float32, que es lo que espera Whisper
+                    state.phrase_queue.put(("final", to_float32(audio_buffer[:write])))
 
                     # Reset buffer
-                    audio_buffer.clear()
-                    is_speaking = False
-
-                # Limpiar buffer si es demasiado grande (ruido)
-                if len(audio_buffer) > buffer_samples - params['SAMPLE_RATE']:
-                    logger.warning("Buffer lleno (ruido constante?), reiniciando buffer...")
-                    audio_buffer.clear()
+                    write = 0
+                    window_energy.clear()
+                    sum_sq, sum_n = 0.0, 0
                     is_speaking = False
 
-                sd.sleep(50)
+                # Mientras se habla, pedir cada PARTIAL_INTERVAL una transcripción
+                # parcial de la frase en curso (sólo si el worker está libre)
+                elif (is_speaking and write > min_len
+                      and current_time - last_partial_time >= PARTIAL_INTERVAL
+                      and state.phrase_queue.empty()):
+                    state.phrase_queue.put(("parcial", to_float32(audio_buffer[:write])))
+                    last_partial_time = current_time
 
         except KeyboardInterrupt:
             print("\nDetenido por el usuario.")
             logger.info("Programa detenido por usuario.")
         except Exception as e:
             logger.error(f"\nOcurrió un error: {e}")
+        finally:
+            # Terminar el pipeline cuando haya procesado las frases pendientes
+            state.phrase_queue.put(None)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file